@@ -1,5 +1,7 @@
 """Flattens a list of nested lists into a one dimensional list."""
 
+import itertools
+
 
 def flatten_list(input_list):
     """Flattens a list of lists into a single list.
@@ -9,20 +11,51 @@ def flatten_list(input_list):
     but to make the function more rigorous, I have implemented the
     iterative solution.
 
+    Lists that are already flat, or that nest only one level deep, are the
+    common case and are flattened directly with C-level builtins rather than
+    with the stack.
+
+    Only elements whose type is exactly list are flattened. Checking the type
+    directly is noticeably faster than isinstance in the hot loop, so
+    instances of list subclasses are kept as single elements.
+
     Args:
         input_list: A list of lists containing any type of element.
 
     Returns:
         A list with all the elements of the input list without any nested lists.
     """
+    if type(input_list) is list:
+        if not any(type(element) is list for element in input_list):
+            return list(input_list)
+        if not any(type(sub_element) is list
+                   for element in input_list if type(element) is list
+                   for sub_element in element):
+            return list(itertools.chain.from_iterable(
+                element if type(element) is list else (element,)
+                for element in input_list))
+
     stack = [input_list]
     result = []
-    while len(stack) > 0:
-        current_element = stack.pop()
-        if isinstance(current_element, list):
+    # Bind the bound methods to locals so the loop does not look them up on
+    # every iteration.
+    stack_pop = stack.pop
+    stack_extend = stack.extend
+    result_append = result.append
+    while stack:
+        current_element = stack_pop()
+        if type(current_element) is list:
             # Add elements to the stack from current_element from end to start.
-            for index in xrange(len(current_element)-1, -1, -1):
-                stack.append(current_element[index])
+            stack_extend(reversed(current_element))
         else:
-            result.append(current_element)
+            result_append(current_element)
     return result
+
+
+# Prefer the compiled implementation from flattenlist_c.pyx when it has been
+# built. The pure Python version stays importable for comparison.
+_python_flatten_list = flatten_list
+try:
+    from flattenlist_c import flatten_list
+except ImportError:
+    pass
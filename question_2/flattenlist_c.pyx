@@ -0,0 +1,42 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""Cython implementation of flattenlist.flatten_list.
+
+Build it in place with:
+
+    cythonize -i flattenlist_c.pyx
+
+flattenlist uses this module when it has been built, and falls back to its
+pure Python implementation otherwise.
+"""
+
+from cpython.list cimport PyList_GET_ITEM, PyList_GET_SIZE
+
+
+cpdef list flatten_list(object input_list):
+    """Flattens a list of lists into a single list.
+
+    Behaves exactly like the pure Python flattenlist.flatten_list, including
+    leaving instances of list subclasses unflattened, but walks the stack
+    with the list C API.
+
+    Args:
+        input_list: A list of lists containing any type of element.
+
+    Returns:
+        A list with all the elements of the input list without any nested lists.
+    """
+    cdef list stack = [input_list]
+    cdef list result = []
+    cdef list current_list
+    cdef object current_element
+    cdef Py_ssize_t index
+    while stack:
+        current_element = stack.pop()
+        if type(current_element) is list:
+            current_list = <list>current_element
+            # Add elements to the stack from current_list from end to start.
+            for index in range(PyList_GET_SIZE(current_list) - 1, -1, -1):
+                stack.append(<object>PyList_GET_ITEM(current_list, index))
+        else:
+            result.append(current_element)
+    return result
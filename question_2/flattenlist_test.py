@@ -1,38 +1,69 @@
 import unittest
 import flattenlist
 
+try:
+    import flattenlist_c
+except ImportError:
+    flattenlist_c = None
+
+
 class TestFlattenList(unittest.TestCase):
 
+    flatten_list = staticmethod(flattenlist._python_flatten_list)
+
     def test_empty_list(self):
-        self.assertListEqual([], flattenlist.flatten_list([[], []]))
+        self.assertListEqual([], self.flatten_list([[], []]))
 
     def test_flat_list(self):
         input_list = [1, 2, 3]
-        self.assertListEqual(flattenlist.flatten_list(input_list), input_list)
+        self.assertListEqual(self.flatten_list(input_list), input_list)
 
     def test_depth_one(self):
         input_list = [1, [1, 2], 3]
         expected_output = [1, 1, 2, 3]
-        self.assertListEqual(flattenlist.flatten_list(input_list),
+        self.assertListEqual(self.flatten_list(input_list),
                              expected_output)
 
     def test_depth_two(self):
         input_list = [1, [2, [3], 4], 5]
         expected_output = [1, 2, 3, 4, 5]
-        self.assertListEqual(flattenlist.flatten_list(input_list),
+        self.assertListEqual(self.flatten_list(input_list),
                              expected_output)
 
     def test_depth_three(self):
         input_list = [[[[1]]]]
         expected_output = [1]
-        self.assertListEqual(flattenlist.flatten_list(input_list),
+        self.assertListEqual(self.flatten_list(input_list),
+                             expected_output)
+
+    def test_mixed_depths(self):
+        input_list = [[1, 2], [3, [4]], 5]
+        expected_output = [1, 2, 3, 4, 5]
+        self.assertListEqual(self.flatten_list(input_list),
                              expected_output)
 
+    def test_non_list_input(self):
+        self.assertListEqual(self.flatten_list('ab'), ['ab'])
+
     def test_different_types(self):
         input_list = [1, ['a', 2], 'b']
         expected_output = [1, 'a', 2, 'b']
-        self.assertListEqual(flattenlist.flatten_list(input_list),
+        self.assertListEqual(self.flatten_list(input_list),
                              expected_output)
 
+    def test_list_subclass_not_flattened(self):
+        class Point(list):
+            pass
+        point = Point([1, 2])
+        input_list = [[point], 3]
+        self.assertListEqual(self.flatten_list(input_list), [point, 3])
+
+
+@unittest.skipIf(flattenlist_c is None, "flattenlist_c has not been built")
+class TestFlattenListC(TestFlattenList):
+
+    flatten_list = staticmethod(
+        flattenlist_c.flatten_list if flattenlist_c else None)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,39 @@
+import _kernel
+import unittest
+import math
+
+import numpy as np
+
+
+class TestKernel(unittest.TestCase):
+
+    def setUp(self):
+        # New York, San Francisco, Dublin and a point ~99 km north of Dublin.
+        self.latitudes = np.radians([40.7128, 37.7749, 53.3498, 54.2382])
+        self.longitudes = np.radians([-74.0059, -122.4194, -6.2603, -6.2603])
+        self.origin = (math.radians(53.3498), math.radians(-6.2603))
+
+    def test_make_vectorized_in_range(self):
+        in_range = _kernel._make_vectorized_in_range(
+            self.origin[0], self.origin[1], 6371.0, 100.0)
+        result = in_range(self.latitudes, self.longitudes)
+        self.assertListEqual(result.tolist(), [False, False, True, True])
+
+    def test_make_in_range_matches_vectorized(self):
+        for max_distance in [100.0, 5115.0, 10000.0]:
+            expected = _kernel._make_vectorized_in_range(
+                self.origin[0], self.origin[1], 6371.0, max_distance)(
+                    self.latitudes, self.longitudes)
+            actual = _kernel.make_in_range(
+                self.origin[0], self.origin[1], 6371.0, max_distance)(
+                    self.latitudes, self.longitudes)
+            self.assertListEqual(actual.tolist(), expected.tolist())
+
+    def test_make_in_range_empty_input(self):
+        empty = np.empty(0, dtype=np.float64)
+        in_range = _kernel.make_in_range(self.origin[0], self.origin[1],
+                                         6371.0, 100.0)
+        self.assertEqual(len(in_range(empty, empty)), 0)
+
+if __name__ == "__main__":
+    unittest.main()
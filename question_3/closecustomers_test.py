@@ -1,10 +1,24 @@
 import closecustomers
 import unittest
 import math
+import os
+from unittest import mock
+
+CUSTOMERS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'customers.json')
 
 
 class TestCloseCustomers(unittest.TestCase):
 
+    def test_iter_customers(self):
+        customers = list(closecustomers.iter_customers(CUSTOMERS_FILE))
+        self.assertEqual(len(customers), 32)
+        self.assertEqual(customers[0].name, 'Christina McArdle')
+
+    def test_iter_customers_missing_file(self):
+        with self.assertRaises(SystemExit):
+            list(closecustomers.iter_customers('missing.json'))
+
     def test_parse_customer_data_with_valid_and_invalid_customers(self):
         valid_input = '{"latitude": "51.92893", "user_id": 1, \
             "name": "Alice Cahill", "longitude": "-10.27699"}'
@@ -15,26 +29,37 @@ class TestCloseCustomers(unittest.TestCase):
         actual_output = closecustomers.parse_customer_data(customer_data)
         self.assertListEqual(expected_output, actual_output)
 
+    def test_parse_customer_data_with_bytes(self):
+        customer_data = [b'{"latitude": "51.92893", "user_id": 1, '
+                         b'"name": "Alice Cahill", "longitude": "-10.27699"}']
+        expected_location = closecustomers.Coordinate(51.92893, -10.27699)
+        expected_output = [closecustomers.Customer('Alice Cahill', 1,
+                                                   expected_location)]
+        actual_output = closecustomers.parse_customer_data(customer_data)
+        self.assertListEqual(expected_output, actual_output)
+
     def test_parse_customer_data_with_empty_customer_list(self):
         self.assertListEqual([], closecustomers.parse_customer_data([]))
 
-    def test_validate_customer_missing_keys(self):
+    def test_parse_and_validate_missing_keys(self):
         input_missing_keys = {'name': 'Hodor'}
-        self.assertFalse(closecustomers.validate_customer(input_missing_keys))
+        self.assertIsNone(closecustomers.parse_and_validate(input_missing_keys))
 
-    def test_validate_customer_invalid_latitude(self):
+    def test_parse_and_validate_invalid_latitude(self):
         invalid_latitude = {'name': 'Dany Targaryen',
                                     'user_id': 1,
                                     'longitude': 'invalid',
                                     'latitude': 'invalid'}
-        self.assertFalse(closecustomers.validate_customer(invalid_latitude))
+        self.assertIsNone(closecustomers.parse_and_validate(invalid_latitude))
 
-    def test_validate_customer(self):
+    def test_parse_and_validate(self):
         valid_input = {'name': 'Jon Snow',
                                'user_id': 1,
                                'longitude': '53.3498',
                                'latitude': '-6.3'}
-        self.assertTrue(closecustomers.validate_customer(valid_input))
+        expected_location = closecustomers.Coordinate(-6.3, 53.3498)
+        self.assertEqual(closecustomers.parse_and_validate(valid_input),
+                         expected_location)
 
     def test_distance(self):
         coord1 = closecustomers.Coordinate(40.7128, -74.0059)
@@ -42,6 +67,10 @@ class TestCloseCustomers(unittest.TestCase):
         test_distance = closecustomers.distance(coord1, coord2)
         self.assertEqual(math.ceil(test_distance), 5115)
 
+    def test_distance_same_location(self):
+        coord = closecustomers.Coordinate(53.3381985, -6.2592576)
+        self.assertEqual(closecustomers.distance(coord, coord), 0.0)
+
     def test_get_customers_in_range(self):
         customers = [
                 closecustomers.Customer('Handsome Jack', 1,
@@ -51,6 +80,69 @@ class TestCloseCustomers(unittest.TestCase):
         self.assertListEqual(closecustomers.get_customers_in_range(customers),
                              [customers[0]])
 
+    def test_get_customers_in_range_near_boundary(self):
+        office = closecustomers.DUBLIN_OFFICE
+        customers = [
+                closecustomers.Customer('Claptrap', 1,
+                    closecustomers.Coordinate(office.latitude + 0.89,
+                                              office.longitude)),
+                closecustomers.Customer('Lilith', 2,
+                    closecustomers.Coordinate(office.latitude + 0.91,
+                                              office.longitude))]
+        self.assertListEqual(closecustomers.get_customers_in_range(customers),
+                             [customers[0]])
+
+    def test_get_customers_in_range_across_batches(self):
+        location = closecustomers.DUBLIN_OFFICE
+        customers = (closecustomers.Customer('Moxxi', user_id, location)
+                     for user_id in range(closecustomers.BATCH_SIZE + 1))
+        customers_in_range = closecustomers.get_customers_in_range(customers)
+        self.assertEqual(len(customers_in_range),
+                         closecustomers.BATCH_SIZE + 1)
+
+    def test_find_customers_in_range(self):
+        expected_output = closecustomers.get_customers_in_range(
+            closecustomers.iter_customers(CUSTOMERS_FILE))
+        self.assertListEqual(
+            closecustomers.find_customers_in_range(CUSTOMERS_FILE),
+            expected_output)
+
+    def test_find_customers_in_range_in_parallel(self):
+        expected_output = closecustomers.get_customers_in_range(
+            closecustomers.iter_customers(CUSTOMERS_FILE))
+        with mock.patch.object(closecustomers, 'PARALLEL_MIN_LINES', 5), \
+                mock.patch.object(closecustomers, 'PARSE_CHUNK_SIZE', 5), \
+                mock.patch.object(closecustomers, 'MAX_CHUNKS_IN_FLIGHT', 2), \
+                mock.patch.object(closecustomers.os, 'cpu_count',
+                                  return_value=2):
+            actual_output = closecustomers.find_customers_in_range(
+                CUSTOMERS_FILE, parallel=True)
+        self.assertListEqual(expected_output, actual_output)
+
+    def test_find_customers_in_range_single_chunk_not_parallel(self):
+        with mock.patch.object(closecustomers, 'PARALLEL_MIN_LINES', 22), \
+                mock.patch.object(closecustomers, 'PARSE_CHUNK_SIZE', 10), \
+                mock.patch.object(closecustomers.os, 'cpu_count',
+                                  return_value=2), \
+                mock.patch.object(closecustomers.concurrent.futures,
+                                  'ProcessPoolExecutor') as executor:
+            customers_in_range = closecustomers.find_customers_in_range(
+                CUSTOMERS_FILE, parallel=True)
+        executor.assert_not_called()
+        self.assertEqual(len(customers_in_range), 16)
+
+    def test_find_customers_in_range_single_cpu_not_parallel(self):
+        with mock.patch.object(closecustomers, 'PARALLEL_MIN_LINES', 5), \
+                mock.patch.object(closecustomers, 'PARSE_CHUNK_SIZE', 5), \
+                mock.patch.object(closecustomers.os, 'cpu_count',
+                                  return_value=1), \
+                mock.patch.object(closecustomers.concurrent.futures,
+                                  'ProcessPoolExecutor') as executor:
+            customers_in_range = closecustomers.find_customers_in_range(
+                CUSTOMERS_FILE, parallel=True)
+        executor.assert_not_called()
+        self.assertEqual(len(customers_in_range), 16)
+
     def test_get_customers_in_range_empty_list(self):
         self.assertListEqual(closecustomers.get_customers_in_range([]), [])
 